@@ -1,11 +1,16 @@
 import os
+import time
+import queue
+import threading
+import orjson
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
-import yfinance as yf
-import requests
-import json
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
+from jinja2 import StrictUndefined, Template
+# Heavy libraries (yfinance, pandas, plotly, httpx) are imported where
+# they are used, so the page renders before they load
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +22,76 @@ if not GROQ_API_KEY:
 
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_MODEL = "llama3-70b-8192"  # Using LLama3 model from Groq
+GROQ_RPM = 50  # Max Groq requests per minute, kept under the provider's rate limit
+GROQ_RETRIES = 3  # Retries for transient Groq failures
+GROQ_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+INFO_CACHE_SECONDS = 900  # Yahoo info payloads are reused within 15-minute buckets
+BAD_TICKER_SECONDS = 300  # Tickers that failed are not retried for 5 minutes
+
+# Industry presets
+INDUSTRY_OPTIONS = {
+    "Custom": (),
+    "Tech Giants": ("AAPL", "MSFT", "GOOGL", "AMZN"),
+    "Semiconductors": ("NVDA", "AMD", "INTC", "TSM"),
+    "Automotive": ("TSLA", "F", "GM", "TM"),
+    "Banking": ("JPM", "BAC", "C", "WFC"),
+}
+
+RESPONSE_CACHE_SIZE = 128  # Max Groq responses kept for repeat analyses
+
+# Prompt templates, compiled once at import
+ANALYZE_PROMPT = """
+        As a financial analyst, provide a comprehensive analysis of {{ data['company_name'] }} ({{ ticker }}) with the following data:
+        
+        MARKET OVERVIEW:
+        - Current Price: ${{ data['current_price'] }}
+        - 52-Week Range: ${{ data['52w_low'] }} - ${{ data['52w_high'] }}
+        - Market Cap: ${{ data['market_cap'] }}
+        
+        FINANCIAL METRICS:
+        - P/E Ratio: {{ data['pe_ratio'] }}
+        - EPS: ${{ data['eps'] }}
+        - 1-Year Price Change: {{ data['price_change_1y'] }}%
+        
+        ANALYST INSIGHTS:
+        - Recommendation: {{ data['recommendation'] }}
+        - Target Price: ${{ data['target_price'] }}
+        
+        Follow this structure:
+        1. Executive Summary (2-3 sentences)
+        2. Financial Performance Analysis
+        3. Market Position
+        4. Future Outlook & Risks
+        5. Investment Perspective
+        
+        Keep the analysis professional but easy to understand for regular investors.
+        Use bullet points for key insights.
+        """
+
+COMPARE_PROMPT = """
+        As a financial analyst, compare these companies: {{ companies }}
+        
+        Here are their key metrics:
+        
+        | Company | Price | P/E | Market Cap | 1Y Change | Recommendation |
+| ------- | ----- | --- | ---------- | --------- | -------------- |
+{% for row in rows %}
+| {{ row['company_name'] }} | ${{ row['current_price'] }} | {{ row['pe_ratio'] }} | ${{ row['market_cap'] }} | {{ row['price_change'] }} | {{ row['recommendation'] }} |
+{% endfor %}
+
+        
+        Provide a comparative analysis with:
+        1. Industry Overview (brief)
+        2. Company-by-Company Performance
+        3. Investment Outlook
+        
+        Keep the analysis simple, clear and accessible for regular investors.
+        Highlight key strengths and weaknesses for each company.
+        """
+
+_ANALYZE_TPL = Template(ANALYZE_PROMPT, undefined=StrictUndefined, trim_blocks=True)
+_COMPARE_TPL = Template(COMPARE_PROMPT, undefined=StrictUndefined, trim_blocks=True)
 
 # Configure page
 st.set_page_config(
@@ -25,21 +100,59 @@ st.set_page_config(
     layout="wide"
 )
 
+@lru_cache(maxsize=256)
+def _fetch_info(ticker_symbol, bucket):
+    """Fetch Yahoo info for a stock, shared by all sessions within a time bucket"""
+    import yfinance as yf
+    return yf.Ticker(ticker_symbol).get_info()
+
+@lru_cache(maxsize=64)
+def parse_tickers(ticker_input):
+    """Split a comma-separated string into upper-case ticker symbols"""
+    return tuple(t.strip().upper() for t in ticker_input.split(','))
+
 class FinanceAgent:
     def __init__(self):
+        import httpx
+        
         self.headers = {
             "Authorization": f"Bearer {GROQ_API_KEY}",
             "Content-Type": "application/json"
         }
+        # Shared HTTP/2 client so repeated API calls multiplex over one TCP+TLS connection
+        self.client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=GROQ_RETRIES,  # Connection failures only
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=8)
+            ),
+            headers=self.headers,
+            timeout=30
+        )
+        # Last failure time of tickers Yahoo couldn't return data for; expired
+        # entries are pruned on each new failure so the map stays small
+        self._bad_tickers = {}
+        self._bad_tickers_lock = threading.Lock()
+        # Send times of recent Groq requests, for rate limiting; the agent is
+        # shared across sessions, so the window is guarded by a lock
+        self._request_times = deque()
+        self._request_times_lock = threading.Lock()
+        # Recent Groq responses keyed by the data they were generated from
+        self._response_cache = OrderedDict()
+        self._response_cache_lock = threading.Lock()
     
-    def get_stock_data(self, ticker_symbol):
-        """Retrieve key financial data for a stock"""
+    def get_stock_data(self, ticker_symbol, history=None):
+        """Retrieve key financial data for a stock, optionally from pre-fetched price history"""
+        error = self.recent_failure(ticker_symbol)
+        if error:
+            return None, error
+        
         try:
-            stock = yf.Ticker(ticker_symbol)
-            
             # Basic info
-            info = stock.info
-            history = stock.history(period="1y")
+            info = _fetch_info(ticker_symbol, int(time.time() // INFO_CACHE_SECONDS))
+            if history is None:
+                import yfinance as yf
+                history = yf.Ticker(ticker_symbol).history(period="1y")
             
             # Compile relevant financial data
             financial_data = {
@@ -55,276 +168,458 @@ class FinanceAgent:
             }
             
             # Calculate price change if history data is available
-            if len(history) > 1:
-                financial_data["price_change_1y"] = ((history["Close"][-1] / history["Close"][0]) - 1) * 100
-            else:
-                financial_data["price_change_1y"] = "N/A"
+            closes = history["Close"].to_numpy()
+            financial_data["price_change_1y"] = (closes[-1] / closes[0] - 1) * 100 if closes.size > 1 else "N/A"
             
             return financial_data, None
         except Exception as e:
+            self._record_failure(ticker_symbol)
             return None, f"Error retrieving data for {ticker_symbol}: {str(e)}"
     
-    def groq_generate(self, prompt):
-        """Generate text using Groq API"""
-        payload = {
+    def recent_failure(self, ticker_symbol):
+        """Return an error if Yahoo failed for this ticker within BAD_TICKER_SECONDS, else None"""
+        # Don't hammer Yahoo with tickers that just failed (e.g. typos)
+        with self._bad_tickers_lock:
+            failed_at = self._bad_tickers.get(ticker_symbol, 0)
+        
+        if time.time() - failed_at < BAD_TICKER_SECONDS:
+            return f"Error retrieving data for {ticker_symbol}: ticker failed recently, try again in a few minutes"
+        return None
+    
+    def _record_failure(self, ticker_symbol):
+        """Remember a failed ticker, dropping entries that have already expired"""
+        now = time.time()
+        with self._bad_tickers_lock:
+            self._bad_tickers = {
+                t: failed_at for t, failed_at in self._bad_tickers.items()
+                if now - failed_at < BAD_TICKER_SECONDS
+            }
+            self._bad_tickers[ticker_symbol] = now
+    
+    def download_history(self, tickers):
+        """Download 1-year price history for several stocks in one batched request"""
+        import yfinance as yf
+        
+        # One shared Tickers object per comparison instead of a Ticker per symbol
+        tickers_obj = yf.Tickers(" ".join(tickers))
+        return tickers_obj.download(period="1y", group_by='ticker', threads=True, progress=False)
+    
+    def _fetch_all(self, tickers, history=None):
+        """Retrieve financial data for several stocks concurrently"""
+        def fetch(ticker):
+            if history is None:
+                return self.get_stock_data(ticker)
+            # Symbols yfinance couldn't parse (e.g. an empty entry) have no columns
+            if ticker not in history.columns.get_level_values(0):
+                return None, f"Error retrieving data for {ticker}: no price history returned"
+            return self.get_stock_data(ticker, history[ticker].dropna(how='all'))
+        
+        with ThreadPoolExecutor(max_workers=min(16, len(tickers))) as ex:
+            return dict(zip(tickers, ex.map(fetch, tickers)))
+    
+    def _payload(self, prompt):
+        """Build the chat completion request body for a prompt"""
+        return {
             "model": GROQ_MODEL,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.2,
             "max_tokens": 2048
         }
-        
+    
+    def _post(self, payload, stream=False):
+        """POST a payload to Groq, retrying 429/5xx responses with exponential backoff"""
+        request = self.client.build_request("POST", GROQ_API_URL, content=orjson.dumps(payload))
+        for attempt in range(GROQ_RETRIES + 1):
+            self._wait_for_rate_limit()
+            response = self.client.send(request, stream=stream)
+            if response.status_code not in GROQ_RETRY_STATUSES or attempt == GROQ_RETRIES:
+                return response
+            response.close()  # Release the connection before retrying
+            time.sleep(0.3 * 2 ** attempt)
+    
+    def groq_generate(self, prompt):
+        """Generate text using Groq API"""
         try:
-            response = requests.post(GROQ_API_URL, headers=self.headers, data=json.dumps(payload))
+            response = self._post(self._payload(prompt))
             response.raise_for_status()  # Raise exception for HTTP errors
-            return response.json()["choices"][0]["message"]["content"]
+            return orjson.loads(response.content)["choices"][0]["message"]["content"]
         except Exception as e:
             return f"Error generating content: {str(e)}"
     
-    def analyze_stock(self, ticker_symbol):
-        """Generate comprehensive analysis for a stock"""
-        data, error = self.get_stock_data(ticker_symbol)
-        
-        if error:
-            return error
-        
-        # Format the data for Groq
-        prompt = f"""
-        As a financial analyst, provide a comprehensive analysis of {data['company_name']} ({ticker_symbol}) with the following data:
+    def groq_stream(self, prompt):
+        """Stream generated text from Groq API as it is produced"""
+        payload = {**self._payload(prompt), "stream": True}
         
-        MARKET OVERVIEW:
-        - Current Price: ${data['current_price']}
-        - 52-Week Range: ${data['52w_low']} - ${data['52w_high']}
-        - Market Cap: ${data['market_cap']}
+        try:
+            response = self._post(payload, stream=True)
+            try:
+                response.raise_for_status()  # Raise exception for HTTP errors
+                # Server-sent events: each chunk arrives as a "data: {...}" line
+                for line in response.iter_lines():
+                    if not line.startswith("data: ") or line == "data: [DONE]":
+                        continue
+                    yield orjson.loads(line[6:])["choices"][0]["delta"].get("content") or ""
+            finally:
+                response.close()
+        except Exception as e:
+            yield f"Error generating content: {str(e)}"
+    
+    def _reserve_request_slot(self):
+        """Record a Groq request if it fits within GROQ_RPM, else return seconds to wait"""
+        with self._request_times_lock:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] > 60:
+                self._request_times.popleft()
+            
+            if len(self._request_times) < GROQ_RPM:
+                self._request_times.append(now)
+                return None
+            
+            return 60 - (now - self._request_times[0])
+    
+    def _wait_for_rate_limit(self):
+        """Block until another Groq request fits within GROQ_RPM"""
+        while (delay := self._reserve_request_slot()) is not None:
+            time.sleep(delay)
+    
+    def _cache_get(self, key):
+        """Return a cached Groq response, or None if there isn't one"""
+        with self._response_cache_lock:
+            if key not in self._response_cache:
+                return None
+            self._response_cache.move_to_end(key)
+            return self._response_cache[key]
+    
+    def _cache_put(self, key, response):
+        """Cache a Groq response, evicting the least recently used beyond RESPONSE_CACHE_SIZE"""
+        if response.startswith("Error generating content"):
+            return
         
-        FINANCIAL METRICS:
-        - P/E Ratio: {data['pe_ratio']}
-        - EPS: ${data['eps']}
-        - 1-Year Price Change: {data['price_change_1y']}%
+        with self._response_cache_lock:
+            self._response_cache[key] = response
+            self._response_cache.move_to_end(key)
+            if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+    
+    def _analysis_key(self, ticker_symbol, data):
+        """Response cache key for a single stock analysis"""
+        return ("analysis", ticker_symbol, tuple(sorted(data.items())))
+    
+    def _comparison_key(self, ticker_list, all_data):
+        """Response cache key for a comparison of several stocks"""
+        return ("comparison",) + tuple(self._analysis_key(t, all_data[t]) for t in ticker_list)
+    
+    def _analysis_prompt(self, ticker_symbol, data):
+        """Format a stock's data into an analysis prompt for Groq"""
+        return _ANALYZE_TPL.render(ticker=ticker_symbol, data=data)
+    
+    def analyze_stock(self, ticker_symbol, data=None):
+        """Generate comprehensive analysis for a stock"""
+        if data is None:
+            data, error = self.get_stock_data(ticker_symbol)
+            
+            if error:
+                return error
         
-        ANALYST INSIGHTS:
-        - Recommendation: {data['recommendation']}
-        - Target Price: ${data['target_price']}
+        key = self._analysis_key(ticker_symbol, data)
+        analysis = self._cache_get(key)
+        if analysis is None:
+            # Generate analysis using Groq
+            analysis = self.groq_generate(self._analysis_prompt(ticker_symbol, data))
+            self._cache_put(key, analysis)
         
-        Follow this structure:
-        1. Executive Summary (2-3 sentences)
-        2. Financial Performance Analysis
-        3. Market Position
-        4. Future Outlook & Risks
-        5. Investment Perspective
+        return analysis
+    
+    def stream_analysis(self, ticker_symbol, data):
+        """Stream comprehensive analysis for a stock as it is generated"""
+        key = self._analysis_key(ticker_symbol, data)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
         
-        Keep the analysis professional but easy to understand for regular investors.
-        Use bullet points for key insights.
-        """
+        chunks = []
+        for chunk in self.groq_stream(self._analysis_prompt(ticker_symbol, data)):
+            chunks.append(chunk)
+            yield chunk
         
-        # Generate analysis using Groq
-        return self.groq_generate(prompt)
+        # A failed stream ends with an error message chunk; don't cache those
+        if chunks and not chunks[-1].startswith("Error generating content"):
+            self._cache_put(key, "".join(chunks))
     
-    def compare_stocks(self, ticker_list):
+    def compare_stocks(self, ticker_list, history=None):
         """Compare multiple stocks in the same industry"""
+        if history is None:
+            history = self.download_history(ticker_list)
+        
         all_data = {}
-        for ticker in ticker_list:
-            data, error = self.get_stock_data(ticker)
+        for ticker, (data, error) in self._fetch_all(ticker_list, history).items():
             if data:
                 all_data[ticker] = data
             else:
                 return f"Error processing {ticker}: {error}"
         
-        # Prepare comparison prompt
-        companies = ", ".join([f"{all_data[t]['company_name']} ({t})" for t in ticker_list])
+        return self.generate_comparison(ticker_list, all_data)
+    
+    def generate_comparison(self, ticker_list, all_data):
+        """Generate comparative analysis from already-retrieved stock data"""
+        key = self._comparison_key(ticker_list, all_data)
+        comparison = self._cache_get(key)
+        if comparison is None:
+            # Generate analysis using Groq
+            comparison = self.groq_generate(self._comparison_prompt(ticker_list, all_data))
+            self._cache_put(key, comparison)
         
-        metrics_table = "| Company | Price | P/E | Market Cap | 1Y Change | Recommendation |\n"
-        metrics_table += "| ------- | ----- | --- | ---------- | --------- | -------------- |\n"
+        return comparison
+    
+    def _comparison_prompt(self, ticker_list, all_data):
+        """Format several stocks' data into a comparison prompt for Groq"""
+        companies = ", ".join([f"{all_data[t]['company_name']} ({t})" for t in ticker_list])
         
+        rows = []
         for ticker in ticker_list:
             data = all_data[ticker]
             price_change = data.get('price_change_1y', 'N/A')
             price_change_str = f"{price_change:.2f}%" if isinstance(price_change, (int, float)) else price_change
-            
-            metrics_table += f"| {data['company_name']} | ${data['current_price']} | {data['pe_ratio']} | ${data['market_cap']} | {price_change_str} | {data['recommendation']} |\n"
-        
-        prompt = f"""
-        As a financial analyst, compare these companies: {companies}
-        
-        Here are their key metrics:
-        
-        {metrics_table}
+            rows.append({**data, "price_change": price_change_str})
         
-        Provide a comparative analysis with:
-        1. Industry Overview (brief)
-        2. Company-by-Company Performance
-        3. Investment Outlook
-        
-        Keep the analysis simple, clear and accessible for regular investors.
-        Highlight key strengths and weaknesses for each company.
-        """
-        
-        # Generate analysis using Groq
-        return self.groq_generate(prompt)
+        return _COMPARE_TPL.render(companies=companies, rows=rows)
 
 # Initialize the Finance Agent
 @st.cache_resource
 def get_finance_agent():
     return FinanceAgent()
 
-try:
+# Cache Yahoo data across reruns so widget interactions don't refetch it
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_stock(ticker_symbol):
+    """Fetch financial data and 1-year price history for a stock"""
     agent = get_finance_agent()
     
-    # Header
-    st.title("📊 Finance Agent")
-    st.markdown("Your personal AI-powered stock analyst")
+    # Skip the history download for tickers that just failed
+    error = agent.recent_failure(ticker_symbol)
+    if error:
+        return None, None, error
     
-    # Create tabs for different analysis types
-    tab1, tab2 = st.tabs(["Single Stock Analysis", "Compare Stocks"])
+    import yfinance as yf
+    history = yf.Ticker(ticker_symbol).history(period="1y")
+    data, error = agent.get_stock_data(ticker_symbol, history)
+    return data, history, error
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_history(ticker_list):
+    """Fetch 1-year price history for several stocks in one batched request"""
+    return get_finance_agent().download_history(ticker_list)
+
+def plot_dates(index):
+    """Convert a price history index to millisecond datetimes, which plotly serializes compactly"""
+    return index.tz_localize(None).values.astype('datetime64[ms]')
+
+def prefetch(chunks):
+    """Start consuming a generator in a background thread and return a generator over its output"""
+    buffer = queue.Queue()
     
-    # Single Stock Analysis Tab
-    with tab1:
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            ticker_symbol = st.text_input("Enter Stock Ticker Symbol (e.g., AAPL, MSFT, GOOGL)", key="single_stock").upper()
-        
-        with col2:
-            analyze_button = st.button("Analyze Stock", key="analyze_single")
-        
-        if ticker_symbol and analyze_button:
-            with st.spinner(f'Analyzing {ticker_symbol}...'):
-                try:
-                    # Get stock data
-                    data, error = agent.get_stock_data(ticker_symbol)
+    def produce():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        finally:
+            buffer.put(None)  # Signal the end of the stream
+    
+    threading.Thread(target=produce, daemon=True).start()
+    
+    def consume():
+        while (chunk := buffer.get()) is not None:
+            yield chunk
+    
+    return consume()
+
+@st.fragment
+def single_stock_tab():
+    """Single stock analysis UI, rerun on its own when its widgets change"""
+    agent = get_finance_agent()
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        ticker_symbol = st.text_input("Enter Stock Ticker Symbol (e.g., AAPL, MSFT, GOOGL)", key="single_stock").upper()
+    
+    with col2:
+        analyze_button = st.button("Analyze Stock", key="analyze_single")
+    
+    if ticker_symbol and analyze_button:
+        with st.spinner(f'Analyzing {ticker_symbol}...'):
+            try:
+                import plotly.graph_objects as go
+                
+                # Get stock data and price history
+                data, stock_history, error = fetch_stock(ticker_symbol)
+                
+                if error:
+                    st.error(error)
+                else:
+                    # Start the AI analysis now so it runs while the chart renders
+                    analysis = prefetch(agent.stream_analysis(ticker_symbol, data))
                     
-                    if error:
-                        st.error(error)
-                    else:
-                        # Show company name
-                        st.subheader(f"{data['company_name']} ({ticker_symbol})")
-                        
-                        # Key metrics in columns
-                        col1, col2, col3 = st.columns(3)
-                        col1.metric("Current Price", f"${data['current_price']}")
-                        col2.metric("Market Cap", f"${data['market_cap']}")
-                        col3.metric("P/E Ratio", f"{data['pe_ratio']}")
-                        
-                        # Price chart
-                        st.subheader("Price History (1 Year)")
-                        stock_history = yf.Ticker(ticker_symbol).history(period="1y")
-                        
-                        if not stock_history.empty:
-                            fig = go.Figure()
-                            fig.add_trace(go.Scatter(
-                                x=stock_history.index, 
-                                y=stock_history['Close'],
+                    # Show company name
+                    st.subheader(f"{data['company_name']} ({ticker_symbol})")
+                    
+                    # Key metrics in columns
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Current Price", f"${data['current_price']}")
+                    col2.metric("Market Cap", f"${data['market_cap']}")
+                    col3.metric("P/E Ratio", f"{data['pe_ratio']}")
+                    
+                    # Price chart
+                    st.subheader("Price History (1 Year)")
+                    
+                    if not stock_history.empty:
+                        fig = go.Figure(dict(
+                            data=[go.Scatter(
+                                x=plot_dates(stock_history.index),
+                                y=stock_history['Close'].to_numpy(),  # float64 keeps cents exact on high-priced tickers
                                 mode='lines',
                                 name='Price',
-                                line=dict(color='#0052cc', width=2)
-                            ))
-                            fig.update_layout(height=400)
-                            st.plotly_chart(fig, use_container_width=True)
+                                line=dict(color='#0052cc', width=2),
+                                hovertemplate='%{x|%b %d, %Y}<br>$%{y:.2f}<extra></extra>'
+                            )],
+                            layout=dict(height=400, uirevision='const')
+                        ))
+                        st.plotly_chart(fig, use_container_width=True)
+                    
+                    # AI Analysis
+                    st.subheader("AI Analysis")
+                    st.write_stream(analysis)
                         
-                        # AI Analysis
-                        st.subheader("AI Analysis")
-                        analysis = agent.analyze_stock(ticker_symbol)
-                        st.markdown(analysis)
-                            
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
+
+@st.fragment
+def compare_tab():
+    """Stock comparison UI, rerun on its own when its widgets change"""
+    agent = get_finance_agent()
     
-    # Compare Stocks Tab
-    with tab2:
-        st.subheader("Compare Multiple Stocks")
-        
-        # Industry presets
-        industry_options = {
-            "Custom": [],
-            "Tech Giants": ["AAPL", "MSFT", "GOOGL", "AMZN"],
-            "Semiconductors": ["NVDA", "AMD", "INTC", "TSM"],
-            "Automotive": ["TSLA", "F", "GM", "TM"],
-            "Banking": ["JPM", "BAC", "C", "WFC"],
-        }
-        
-        selected_option = st.selectbox("Select Industry or Custom", list(industry_options.keys()))
-        
-        if selected_option == "Custom":
-            ticker_input = st.text_input("Enter ticker symbols separated by commas (e.g., AAPL,MSFT,GOOGL)")
-            if ticker_input:
-                ticker_list = [t.strip().upper() for t in ticker_input.split(',')]
-            else:
-                ticker_list = []
+    st.subheader("Compare Multiple Stocks")
+    
+    selected_option = st.selectbox("Select Industry or Custom", list(INDUSTRY_OPTIONS.keys()))
+    
+    if selected_option == "Custom":
+        ticker_input = st.text_input("Enter ticker symbols separated by commas (e.g., AAPL,MSFT,GOOGL)")
+        if ticker_input:
+            ticker_list = parse_tickers(ticker_input)
         else:
-            ticker_list = industry_options[selected_option]
-            st.write(f"Selected tickers: {', '.join(ticker_list)}")
-        
-        compare_button = st.button("Compare Stocks")
-        
-        if ticker_list and len(ticker_list) >= 2 and compare_button:
-            with st.spinner(f'Comparing {", ".join(ticker_list)}...'):
-                try:
-                    # Get data for each stock
-                    all_data = {}
-                    error_occurred = False
+            ticker_list = ()
+    else:
+        ticker_list = INDUSTRY_OPTIONS[selected_option]
+        st.write(f"Selected tickers: {', '.join(ticker_list)}")
+    
+    compare_button = st.button("Compare Stocks")
+    
+    if ticker_list and len(ticker_list) >= 2 and compare_button:
+        with st.spinner(f'Comparing {", ".join(ticker_list)}...'):
+            try:
+                import numpy as np
+                import pandas as pd
+                import plotly.graph_objects as go
+                
+                # Download all price histories in one batched request
+                hist = fetch_history(ticker_list)
+                
+                # Get data for each stock
+                all_data = {}
+                error_occurred = False
+                
+                for ticker, (data, error) in agent._fetch_all(ticker_list, hist).items():
+                    if error:
+                        st.error(error)
+                        error_occurred = True
+                        break
+                    all_data[ticker] = data
+                
+                if not error_occurred:
+                    # Create comparison table column by column; object dtype keeps each
+                    # cell as retrieved, so it formats exactly like an f-string would
+                    df = pd.DataFrame([all_data[t] for t in ticker_list], index=list(ticker_list), dtype=object)
+                    price_change = pd.to_numeric(df['price_change_1y'], errors='coerce')
                     
-                    for ticker in ticker_list:
-                        data, error = agent.get_stock_data(ticker)
-                        if error:
-                            st.error(error)
-                            error_occurred = True
-                            break
-                        all_data[ticker] = data
+                    comparison_df = pd.DataFrame({
+                        'Company': df['company_name'].map(str).str.cat(df.index, sep=' (') + ')',
+                        'Price': '$' + df['current_price'].map(str),
+                        'P/E': df['pe_ratio'].infer_objects(),
+                        'Market Cap': '$' + df['market_cap'].map(str),
+                        '1Y Change': np.where(price_change.notna(), price_change.map('{:.2f}%'.format), 'N/A'),
+                        'Recommendation': df['recommendation'].infer_objects()
+                    }).reset_index(drop=True)
                     
-                    if not error_occurred:
-                        # Create comparison table
-                        comparison_data = []
-                        for ticker in ticker_list:
-                            data = all_data[ticker]
-                            price_change = data.get('price_change_1y', 'N/A')
-                            price_change_str = f"{price_change:.2f}%" if isinstance(price_change, (int, float)) else price_change
-                            
-                            comparison_data.append({
-                                'Company': f"{data['company_name']} ({ticker})",
-                                'Price': f"${data['current_price']}",
-                                'P/E': data['pe_ratio'],
-                                'Market Cap': f"${data['market_cap']}",
-                                '1Y Change': price_change_str,
-                                'Recommendation': data['recommendation']
-                            })
-                        
-                        st.subheader("Comparison Metrics")
-                        comparison_df = pd.DataFrame(comparison_data)
-                        st.table(comparison_df)
-                        
-                        # Price comparison chart
-                        st.subheader("Price Performance (1 Year)")
-                        
-                        fig = go.Figure()
-                        for ticker in ticker_list:
-                            stock_history = yf.Ticker(ticker).history(period="1y")
-                            if not stock_history.empty:
-                                # Normalize to percentage change
-                                first_price = stock_history['Close'].iloc[0]
-                                normalized_prices = (stock_history['Close'] / first_price - 1) * 100
-                                
-                                fig.add_trace(go.Scatter(
-                                    x=stock_history.index,
-                                    y=normalized_prices,
-                                    mode='lines',
-                                    name=ticker
-                                ))
-                        
-                        fig.update_layout(
+                    st.subheader("Comparison Metrics")
+                    st.table(comparison_df)
+                    
+                    # Price comparison chart
+                    st.subheader("Price Performance (1 Year)")
+                    
+                    # Every ticker shares the batched download's date index, so convert it once
+                    x = plot_dates(hist.index)
+                    
+                    # Normalize every ticker to percentage change in one broadcast,
+                    # relative to each ticker's first valid close
+                    closes = hist.xs('Close', axis=1, level=1).reindex(columns=list(ticker_list))
+                    first_closes = closes.bfill().iloc[0].to_numpy()
+                    normalized_prices = ((closes.to_numpy() / first_closes - 1) * 100).astype('float32')
+                    
+                    traces = []
+                    for i, ticker in enumerate(ticker_list):
+                        if not np.isnan(first_closes[i]):
+                            # WebGL traces stay fast in the browser as the ticker count grows
+                            traces.append(go.Scattergl(
+                                x=x,
+                                y=normalized_prices[:, i],
+                                mode='lines',
+                                name=ticker,
+                                connectgaps=True,
+                                hovertemplate='%{y:.2f}%<extra>%{fullData.name}</extra>'
+                            ))
+                    
+                    # Build the figure in one go rather than with repeated add_trace calls
+                    fig = go.Figure(dict(
+                        data=traces,
+                        layout=dict(
                             height=400,
                             yaxis_title="% Change",
-                            legend_title="Companies"
+                            legend_title="Companies",
+                            uirevision='const'
                         )
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        # AI Analysis
-                        st.subheader("AI-Powered Comparison")
-                        comparison = agent.compare_stocks(ticker_list)
-                        st.markdown(comparison)
-                
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
-        elif ticker_list and compare_button:
-            st.warning("Please select at least 2 stocks for comparison")
+                    ))
+                    st.plotly_chart(fig, use_container_width=True)
+                    
+                    # AI Analysis
+                    st.subheader("AI-Powered Comparison")
+                    comparison = agent.generate_comparison(ticker_list, all_data)
+                    st.markdown(comparison)
+            
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
+    elif ticker_list and compare_button:
+        st.warning("Please select at least 2 stocks for comparison")
+
+
+try:
+    # Header
+    st.title("📊 Finance Agent")
+    st.markdown("Your personal AI-powered stock analyst")
+    
+    # Initialize the agent up front so configuration errors surface here
+    get_finance_agent()
+    
+    # Create tabs for different analysis types
+    tab1, tab2 = st.tabs(["Single Stock Analysis", "Compare Stocks"])
+    
+    # Single Stock Analysis Tab
+    with tab1:
+        single_stock_tab()
+    
+    # Compare Stocks Tab
+    with tab2:
+        compare_tab()
 
 except Exception as e:
     st.error(f"Failed to initialize Finance Agent: {str(e)}")